@@ -1,3 +1,6 @@
+import glob
+import os
+
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -20,41 +23,169 @@ except ImportError:
     LOWESS_AVAILABLE = False
     st.warning("For full functionality, please install statsmodels: `pip install statsmodels`")
 
-# Load data from CSV with error handling
-@st.cache_data
-def load_data():
+# numexpr is optional - DataFrame.eval falls back to the pure Python engine without it
+try:
+    import numexpr  # noqa: F401
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+CSV_PATH = 'Tata1MG_Realistic_Medicine_Dataset.csv'
+# Bump DATA_VERSION whenever the derived frame changes (CSV_DTYPES, as_categories, the
+# derived columns) so sidecars and cached frames built by older code are not reused
+DATA_VERSION = 2
+PARQUET_PATH = f'Tata1MG_Realistic_Medicine_Dataset.v{DATA_VERSION}.parquet'
+
+REQUIRED_COLUMNS = ['City', 'Month', 'Disease', 'Medicine', 'Orders', 'Price']
+COMPETITOR_COLUMNS = ['Competitor_Price', 'Competitor Price', 'Comp_Price', 'CompetitorPrice']
+PROFIT_MARGIN_RATE = 0.3  # Assuming 30% margin
+
+# Caches are shared by every session, so only the most recent filter states are kept.
+# Filtered frames can be as large as the whole dataset, so fewer of those are held.
+FILTER_CACHE_ENTRIES = 8
+FIGURE_CACHE_ENTRIES = 32
+
+CATEGORY_COLUMNS = ['City', 'Month', 'Disease', 'Medicine']
+
+# Explicit dtypes skip pandas' type inference; entries for absent columns are ignored
+CSV_DTYPES = {
+    'City': 'category',
+    'Disease': 'category',
+    'Medicine': 'category',
+    'Month': 'category',
+    'Orders': 'int32',
+    # Money columns stay float64 so prices display exactly as written in the CSV
+    'Price': 'float64',
+    **{name: 'float64' for name in COMPETITOR_COLUMNS},
+}
+
+# Static page content, built once at import rather than on every rerun
+CUSTOM_CSS = """
+<style>
+    .main {
+        background-color: #f5f5f5;
+    }
+    .header {
+        color: #00a0e3;
+        font-size: 36px;
+        font-weight: bold;
+    }
+    .subheader {
+        color: #333;
+        font-size: 24px;
+    }
+    .metric-box {
+        background-color: white;
+        border-radius: 10px;
+        padding: 15px;
+        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+        margin-bottom: 20px;
+    }
+    .highlight {
+        background-color: #e6f7ff;
+        border-left: 4px solid #00a0e3;
+        padding: 10px;
+        margin: 10px 0;
+    }
+</style>
+"""
+
+RECOMMENDATIONS_HTML = """
+<div class="highlight">
+<h4>📈 Pricing Strategy Recommendations:</h4>
+<ul>
+    <li><strong>Selective Price Increases:</strong> For medicines with high demand and low price sensitivity, consider gradual price increases.</li>
+    <li><strong>Competitive Pricing:</strong> Maintain competitive pricing for high-volume medicines to drive customer acquisition.</li>
+    <li><strong>Dynamic Pricing:</strong> Implement dynamic pricing based on regional competition and demand patterns.</li>
+</ul>
+</div>
+
+<div class="highlight">
+<h4>🏙️ Regional Strategy Recommendations:</h4>
+<ul>
+    <li><strong>Focus on High-Growth Cities:</strong> Allocate more marketing resources to cities showing strong growth potential.</li>
+    <li><strong>Localized Promotions:</strong> Create city-specific promotions based on prevalent diseases in each region.</li>
+    <li><strong>Inventory Optimization:</strong> Adjust inventory levels based on regional disease patterns and seasonal trends.</li>
+</ul>
+</div>
+
+<div class="highlight">
+<h4>📊 Data-Driven Opportunities:</h4>
+<ul>
+    <li><strong>Predictive Analytics:</strong> Use historical sales data to forecast demand and optimize inventory.</li>
+    <li><strong>Customer Segmentation:</strong> Analyze purchase patterns to create targeted marketing campaigns.</li>
+    <li><strong>Price Monitoring:</strong> Establish automated price tracking to respond quickly to market changes.</li>
+</ul>
+</div>
+"""
+
+def as_categories(df):
+    # Categorical codes let isin/groupby work on integers instead of Python strings.
+    # Categories keep first-appearance order (January..December) rather than alphabetical.
+    for col in CATEGORY_COLUMNS:
+        values = df[col].astype('category')
+        df[col] = values.cat.reorder_categories(values.dropna().drop_duplicates().tolist())
+    return df
+
+def parquet_is_fresh():
+    # The sidecar is only trusted if it was written after the CSV was last modified
+    return (os.path.exists(PARQUET_PATH) and
+            os.path.getmtime(PARQUET_PATH) >= os.path.getmtime(CSV_PATH))
+
+# Read data from the Parquet sidecar if fresh, otherwise from CSV with error handling
+def read_data():
     try:
-        df = pd.read_csv('Tata1MG_Realistic_Medicine_Dataset.csv')
+        if parquet_is_fresh():
+            try:
+                return as_categories(pd.read_parquet(PARQUET_PATH, engine='pyarrow'))
+            except Exception:
+                pass  # Corrupt or unreadable sidecar - rebuild it from the CSV
+
+        # Only read the columns the dashboard uses
+        df = pd.read_csv(CSV_PATH,
+                         usecols=lambda col: col in REQUIRED_COLUMNS or col in COMPETITOR_COLUMNS,
+                         dtype=CSV_DTYPES, engine='c')
         
         # Verify required columns exist
-        required_columns = ['City', 'Month', 'Disease', 'Medicine', 'Orders', 'Price']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
         
         if missing_columns:
             st.error(f"Missing required columns: {', '.join(missing_columns)}")
             st.stop()
             
+        df = as_categories(df)
+            
         # Handle competitor price
         competitor_col = None
-        possible_names = ['Competitor_Price', 'Competitor Price', 'Comp_Price', 'CompetitorPrice']
         
-        for name in possible_names:
+        for name in COMPETITOR_COLUMNS:
             if name in df.columns:
                 competitor_col = name
                 break
                 
+        expressions = []
         if competitor_col:
-            df['Price_Difference'] = df[competitor_col] - df['Price']
-            df['Price_Ratio'] = df['Price'] / df[competitor_col]
+            expressions.append(f"Price_Difference = `{competitor_col}` - Price")
+            expressions.append(f"Price_Ratio = Price / `{competitor_col}`")
         else:
             st.warning("Competitor price column not found - using default values")
             df['Price_Difference'] = 0
             df['Price_Ratio'] = 1
             
-        # Calculate derived metrics
-        df['Revenue'] = df['Orders'] * df['Price']
-        df['Profit_Margin'] = df['Price'] * 0.3  # Assuming 30% margin
-        df['Total_Profit'] = df['Profit_Margin'] * df['Orders']
+        # Calculate derived metrics in one fused evaluation
+        expressions.append("Revenue = Orders * Price")
+        df.eval("\n".join(expressions), engine='numexpr' if NUMEXPR_AVAILABLE else 'python',
+                inplace=True)
+        
+        # Write the sidecar for the next cold start and drop any from older versions;
+        # a read-only checkout just skips it
+        try:
+            df.to_parquet(PARQUET_PATH, engine='pyarrow', compression='zstd')
+            for path in glob.glob('Tata1MG_Realistic_Medicine_Dataset*.parquet'):
+                if path != PARQUET_PATH:
+                    os.remove(path)
+        except Exception:
+            pass
         
         return df
         
@@ -62,38 +193,165 @@ def load_data():
         st.error(f"Error loading data: {str(e)}")
         st.stop()
 
-df = load_data()
+def data_version():
+    # Cache key for everything derived from the CSV: its mtime plus the schema version, since
+    # Streamlit only hashes a cached function's own source, not the helpers it calls.
+    # A missing file is reported by read_data.
+    mtime = os.path.getmtime(CSV_PATH) if os.path.exists(CSV_PATH) else None
+    return mtime, DATA_VERSION
 
-# Custom CSS
-st.markdown("""
-<style>
-    .main {
-        background-color: #f5f5f5;
+# Load data once, along with the sidebar options and price bounds that never change for it.
+# The entry is persisted to disk so a restarted process skips even the sidecar read. It is
+# keyed on data_version(), so a replaced CSV or a schema bump is a cache miss rather than a
+# stale hit. max_entries only bounds the in-memory copy; pickles for superseded keys stay
+# in Streamlit's disk cache until it is cleared.
+@st.cache_data(persist="disk", max_entries=1, show_spinner=False)
+def load_data(data_key):
+    df = read_data()
+    meta = {
+        'cities': df['City'].cat.categories.tolist(),
+        'months': df['Month'].cat.categories.tolist(),
+        'diseases': df['Disease'].cat.categories.tolist(),
+        'pmin': int(df['Price'].min()),
+        'pmax': int(df['Price'].max()),
     }
-    .header {
-        color: #00a0e3;
-        font-size: 36px;
-        font-weight: bold;
-    }
-    .subheader {
-        color: #333;
-        font-size: 24px;
-    }
-    .metric-box {
-        background-color: white;
-        border-radius: 10px;
-        padding: 15px;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        margin-bottom: 20px;
-    }
-    .highlight {
-        background-color: #e6f7ff;
-        border-left: 4px solid #00a0e3;
-        padding: 10px;
-        margin: 10px 0;
+    return df, meta
+
+def category_mask(series, selected):
+    # Every category selected (the default) - nothing to filter
+    categories = series.cat.categories
+    if len(set(selected)) == len(categories):
+        return None
+    # Match on the integer category codes rather than comparing strings row by row
+    wanted = np.flatnonzero(categories.isin(selected))
+    return np.isin(series.cat.codes.to_numpy(), wanted)
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def get_filtered(data_key, cities, months, diseases, pmin, pmax):
+    df, _ = load_data(data_key)
+    price = df['Price'].to_numpy()
+    masks = [
+        category_mask(df['City'], cities),
+        category_mask(df['Month'], months),
+        category_mask(df['Disease'], diseases),
+        price >= pmin if pmin > price.min() else None,
+        price <= pmax if pmax < price.max() else None,
+    ]
+    masks = [mask for mask in masks if mask is not None]
+    # No predicate left - skip building a mask. st.cache_data still hands every caller
+    # its own unpickled copy, so this saves the mask work, not the copy.
+    if not masks:
+        return df
+    return df.iloc[np.logical_and.reduce(masks)]
+
+def sort_by_name(agg, col):
+    # Grouping a categorical follows category (first-appearance) order; list groups
+    # alphabetically instead, as the charts did when these columns were plain strings
+    return agg.sort_values(col, key=lambda values: values.astype(str), ignore_index=True)
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def get_aggregates(filters):
+    # One groupby per dimension, shared by every tab. Keyed by the filter tuple
+    # so the filtered frame itself is never hashed.
+    filtered_df = get_filtered(*filters)
+    city_agg = sort_by_name(filtered_df.groupby('City', observed=True).agg(
+        {'Orders': 'sum', 'Revenue': 'sum', 'Price_Difference': 'mean'}).reset_index(), 'City')
+    disease_agg = sort_by_name(
+        filtered_df.groupby('Disease', observed=True)['Orders'].sum().reset_index(), 'Disease')
+    # Months keep category order, so the trend line runs January..December
+    month_agg = filtered_df.groupby('Month', observed=True)['Orders'].sum().reset_index()
+    return city_agg, disease_agg, month_agg
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def get_lowess(filters):
+    # Single Orders ~ Price trend across all medicines, sorted by price for plotting
+    filtered_df = get_filtered(*filters)
+    return sm.nonparametric.lowess(filtered_df['Orders'], filtered_df['Price'], return_sorted=True)
+
+@st.cache_data(max_entries=1)
+def get_kpis(data_key):
+    # The KPIs cover the unfiltered data, so the data key is the only key needed
+    df, _ = load_data(data_key)
+    return {
+        'revenue': df['Revenue'].sum(),
+        'orders': df['Orders'].sum(),
+        'price_difference': df['Price_Difference'].mean(),
+        # Mean of Price * margin rate, without materialising a per-row margin column
+        'profit_margin': PROFIT_MARGIN_RATE * df['Price'].mean(),
     }
-</style>
-""", unsafe_allow_html=True)
+
+def quartile_box(values, name, color):
+    # Send the five summary statistics instead of every price to the browser
+    lowest, q1, median, q3, highest = np.quantile(values, [0.0, 0.25, 0.5, 0.75, 1.0])
+    return go.Box(q1=[q1], median=[median], q3=[q3], lowerfence=[lowest], upperfence=[highest],
+                  name=name, marker_color=color)
+
+def agg_rows(agg, columns):
+    # Compact, hashable cache key for a small aggregate frame
+    return tuple(agg[columns].itertuples(index=False, name=None))
+
+def rows_frame(rows, dtypes):
+    # Rebuild the aggregate with explicit dtypes - an empty selection gives no rows,
+    # and inferring from nothing would leave every column as object
+    return pd.DataFrame(list(rows), columns=list(dtypes)).astype(dtypes)
+
+# Figures are memoised on the aggregate rows they plot, so a chart whose inputs did
+# not change is reused instead of going through plotly express again
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def bar_orders_by_city(rows):
+    return px.bar(rows_frame(rows, {'City': 'object', 'Orders': 'int64'}),
+                  x='City', y='Orders', title='Total Orders by City',
+                  color='City', color_discrete_sequence=px.colors.qualitative.Pastel)
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def pie_orders_by_disease(rows):
+    return px.pie(rows_frame(rows, {'Disease': 'object', 'Orders': 'int64'}),
+                  values='Orders', names='Disease', title='Order Distribution by Disease',
+                  hole=0.4, color_discrete_sequence=px.colors.qualitative.Pastel)
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def line_orders_by_month(rows):
+    return px.line(rows_frame(rows, {'Month': 'object', 'Orders': 'int64'}),
+                   x='Month', y='Orders', title='Monthly Sales Trend',
+                   markers=True, line_shape='spline')
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def bar_revenue_by_city(rows):
+    return px.bar(rows_frame(rows, {'City': 'object', 'Revenue': 'float64'}),
+                  x='City', y='Revenue', title='Revenue by City',
+                  color='City', color_discrete_sequence=px.colors.sequential.Blues_r)
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def bar_price_difference_by_city(rows):
+    return px.bar(rows_frame(rows, {'City': 'object', 'Price_Difference': 'float64'}),
+                  x='City', y='Price_Difference',
+                  title='Average Price Difference by City',
+                  color='Price_Difference', color_continuous_scale='Bluered')
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def geo_sales_by_city(rows):
+    city_agg = rows_frame(rows, {'City': 'object', 'Orders': 'int64', 'Revenue': 'float64'})
+    # Only the per-city aggregate is sent to the browser; sizeref matches px's
+    # max(size) / size_max ** 2 with size_max=20, so markers keep their old area
+    max_orders = city_agg['Orders'].max() if not city_agg.empty else 1
+    fig = go.Figure(go.Scattergeo(locations=city_agg['City'], locationmode='country names',
+                                  marker=dict(size=city_agg['Orders'], sizemode='area',
+                                              sizeref=max_orders / 20 ** 2,
+                                              color=city_agg['Revenue'], colorscale='Blues',
+                                              showscale=True, colorbar_title_text='Revenue'),
+                                  customdata=city_agg[['Revenue', 'Orders']].to_numpy(),
+                                  hovertemplate='<b>%{location}</b><br>Revenue=%{customdata[0]:,.0f}'
+                                                '<br>Orders=%{customdata[1]:,.0f}<extra></extra>'))
+    fig.update_geos(scope='asia', center={'lat': 20, 'lon': 78}, projection_type='natural earth')
+    fig.update_layout(title='Geographic Sales Distribution')
+    return fig
+
+data_key = data_version()
+df, meta = load_data(data_key)
+kpis = get_kpis(data_key)
+
+# Custom CSS
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 # Header
 st.markdown('<p class="header">Tata 1mg Pharmaceutical Sales Insights</p>', unsafe_allow_html=True)
@@ -106,30 +364,34 @@ st.markdown('<p class="subheader">Key Performance Indicators</p>', unsafe_allow_
 
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    st.markdown('<div class="metric-box">Total Revenue<br><h2>₹{:,.0f}</h2></div>'.format(df['Revenue'].sum()), unsafe_allow_html=True)
+    st.markdown('<div class="metric-box">Total Revenue<br><h2>₹{:,.0f}</h2></div>'.format(kpis['revenue']), unsafe_allow_html=True)
 with col2:
-    st.markdown('<div class="metric-box">Total Orders<br><h2>{:,.0f}</h2></div>'.format(df['Orders'].sum()), unsafe_allow_html=True)
+    st.markdown('<div class="metric-box">Total Orders<br><h2>{:,.0f}</h2></div>'.format(kpis['orders']), unsafe_allow_html=True)
 with col3:
-    st.markdown('<div class="metric-box">Avg Price Difference<br><h2>₹{:,.1f}</h2></div>'.format(df['Price_Difference'].mean()), unsafe_allow_html=True)
+    st.markdown('<div class="metric-box">Avg Price Difference<br><h2>₹{:,.1f}</h2></div>'.format(kpis['price_difference']), unsafe_allow_html=True)
 with col4:
-    st.markdown('<div class="metric-box">Avg Profit Margin<br><h2>₹{:,.1f}</h2></div>'.format(df['Profit_Margin'].mean()), unsafe_allow_html=True)
+    st.markdown('<div class="metric-box">Avg Profit Margin<br><h2>₹{:,.1f}</h2></div>'.format(kpis['profit_margin']), unsafe_allow_html=True)
 
 # Filters
 st.sidebar.header("Filters")
-selected_cities = st.sidebar.multiselect("Select Cities", options=df['City'].unique(), default=df['City'].unique())
-selected_months = st.sidebar.multiselect("Select Months", options=df['Month'].unique(), default=df['Month'].unique())
-selected_diseases = st.sidebar.multiselect("Select Diseases", options=df['Disease'].unique(), default=df['Disease'].unique())
-price_range = st.sidebar.slider("Price Range (₹)", min_value=int(df['Price'].min()), max_value=int(df['Price'].max()), 
-                              value=(int(df['Price'].min()), int(df['Price'].max())))
+selected_cities = st.sidebar.multiselect("Select Cities", options=meta['cities'], default=meta['cities'])
+selected_months = st.sidebar.multiselect("Select Months", options=meta['months'], default=meta['months'])
+selected_diseases = st.sidebar.multiselect("Select Diseases", options=meta['diseases'], default=meta['diseases'])
+price_range = st.sidebar.slider("Price Range (₹)", min_value=meta['pmin'], max_value=meta['pmax'], 
+                              value=(meta['pmin'], meta['pmax']))
 
 # Apply filters
-filtered_df = df[
-    (df['City'].isin(selected_cities)) &
-    (df['Month'].isin(selected_months)) &
-    (df['Disease'].isin(selected_diseases)) &
-    (df['Price'] >= price_range[0]) &
-    (df['Price'] <= price_range[1])
-]
+# The data key leads the tuple so every cached helper keyed on it follows a data change
+filters = (
+    data_key,
+    tuple(sorted(selected_cities)),
+    tuple(sorted(selected_months)),
+    tuple(sorted(selected_diseases)),
+    price_range[0],
+    price_range[1],
+)
+filtered_df = get_filtered(*filters)
+city_agg, disease_agg, month_agg = get_aggregates(filters)
 
 # Main Analysis
 tab1, tab2, tab3, tab4 = st.tabs(["Sales Overview", "Pricing Strategy", "Regional Analysis", "Recommendations"])
@@ -139,21 +401,15 @@ with tab1:
     
     col1, col2 = st.columns(2)
     with col1:
-        fig = px.bar(filtered_df.groupby('City')['Orders'].sum().reset_index(), 
-                    x='City', y='Orders', title='Total Orders by City',
-                    color='City', color_discrete_sequence=px.colors.qualitative.Pastel)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(bar_orders_by_city(agg_rows(city_agg, ['City', 'Orders'])),
+                        use_container_width=True)
     
     with col2:
-        fig = px.pie(filtered_df.groupby('Disease')['Orders'].sum().reset_index(), 
-                    values='Orders', names='Disease', title='Order Distribution by Disease',
-                    hole=0.4, color_discrete_sequence=px.colors.qualitative.Pastel)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(pie_orders_by_disease(agg_rows(disease_agg, ['Disease', 'Orders'])),
+                        use_container_width=True)
     
-    fig = px.line(filtered_df.groupby('Month')['Orders'].sum().reset_index(), 
-                 x='Month', y='Orders', title='Monthly Sales Trend',
-                 markers=True, line_shape='spline')
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(line_orders_by_month(agg_rows(month_agg, ['Month', 'Orders'])),
+                    use_container_width=True)
 
 with tab2:
     st.markdown('<p class="subheader">Pricing Analysis</p>', unsafe_allow_html=True)
@@ -161,31 +417,50 @@ with tab2:
     col1, col2 = st.columns(2)
     with col1:
         fig = go.Figure()
-        fig.add_trace(go.Box(y=filtered_df['Price'], name='Our Price', marker_color='#00a0e3'))
-        if 'Price_Difference' in df.columns and df['Price_Difference'].sum() > 0:
-            fig.add_trace(go.Box(y=filtered_df['Price'] + filtered_df['Price_Difference'], 
-                               name='Competitor Price', marker_color='#ff7f0e'))
+        if not filtered_df.empty:
+            price = filtered_df['Price'].to_numpy()
+            fig.add_trace(quartile_box(price, 'Our Price', '#00a0e3'))
+            if 'Price_Difference' in df.columns and df['Price_Difference'].sum() > 0:
+                fig.add_trace(quartile_box(price + filtered_df['Price_Difference'].to_numpy(),
+                                           'Competitor Price', '#ff7f0e'))
         fig.update_layout(title='Price Comparison', yaxis_title='Price (₹)')
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        if LOWESS_AVAILABLE:
-            fig = px.scatter(filtered_df, x='Price', y='Orders', color='Medicine',
-                            title='Price Elasticity Analysis (Orders vs Price)',
-                            hover_data=['Medicine', 'Disease', 'City'],
-                            trendline="lowess", trendline_color_override="red")
-        else:
-            fig = px.scatter(filtered_df, x='Price', y='Orders', color='Medicine',
-                            title='Price Elasticity Analysis (Orders vs Price)',
-                            hover_data=['Medicine', 'Disease', 'City'])
+        # One WebGL trace per medicine instead of handing the whole frame to px.scatter
+        fig = go.Figure()
+        colors = px.colors.qualitative.Plotly
+        for i, (medicine, group) in enumerate(filtered_df.groupby('Medicine', observed=True)):
+            fig.add_trace(go.Scattergl(x=group['Price'], y=group['Orders'], mode='markers',
+                                       name=medicine, marker_color=colors[i % len(colors)],
+                                       customdata=group[['Disease', 'City']].to_numpy(),
+                                       hovertemplate='Medicine=%{fullData.name}<br>Price=%{x}<br>Orders=%{y}'
+                                                     '<br>Disease=%{customdata[0]}<br>City=%{customdata[1]}'
+                                                     '<extra></extra>'))
+        # One overall trend line, replacing the per-medicine red lines px drew with
+        # trendline_scope='trace'
+        if LOWESS_AVAILABLE and len(filtered_df) > 1:
+            trend = get_lowess(filters)
+            fig.add_trace(go.Scatter(x=trend[:, 0], y=trend[:, 1], mode='lines',
+                                     name='LOWESS trend', line_color='red'))
+        fig.update_layout(title='Price Elasticity Analysis (Orders vs Price)',
+                          xaxis_title='Price', yaxis_title='Orders', legend_title_text='Medicine')
         st.plotly_chart(fig, use_container_width=True)
     
     if 'Price_Difference' in df.columns:
         st.markdown('<p class="subheader">Price Optimization Opportunities</p>', unsafe_allow_html=True)
-        price_opp_df = filtered_df[filtered_df['Price_Difference'] > 5].sort_values('Price_Difference', ascending=False)
+        # Project the displayed columns first, then select positions from the raw ndarray
+        price_opp_df = filtered_df[['Medicine', 'City', 'Month', 'Price', 'Price_Difference', 'Orders']]
+        opp_rows = (price_opp_df['Price_Difference'].to_numpy() > 5).nonzero()[0]
+        price_opp_df = price_opp_df.iloc[opp_rows].sort_values('Price_Difference', ascending=False)
         if not price_opp_df.empty:
-            st.dataframe(price_opp_df[['Medicine', 'City', 'Month', 'Price', 'Price_Difference', 'Orders']]
-                        .style.background_gradient(cmap='Blues', subset=['Price_Difference']),
+            # Rendered client-side from the raw numbers instead of per-cell Styler CSS
+            st.dataframe(price_opp_df,
+                        column_config={
+                            'Price_Difference': st.column_config.ProgressColumn(
+                                'Price_Difference', format='₹%.2f', min_value=0,
+                                max_value=float(price_opp_df['Price_Difference'].max())),
+                        },
                         use_container_width=True)
         else:
             st.info("No significant price optimization opportunities found with current filters.")
@@ -195,63 +470,20 @@ with tab3:
     
     col1, col2 = st.columns(2)
     with col1:
-        fig = px.bar(filtered_df.groupby('City')['Revenue'].sum().reset_index(), 
-                    x='City', y='Revenue', title='Revenue by City',
-                    color='City', color_discrete_sequence=px.colors.sequential.Blues_r)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(bar_revenue_by_city(agg_rows(city_agg, ['City', 'Revenue'])),
+                        use_container_width=True)
     
     with col2:
         if 'Price_Difference' in df.columns:
-            fig = px.bar(filtered_df.groupby('City')['Price_Difference'].mean().reset_index(), 
-                        x='City', y='Price_Difference', 
-                        title='Average Price Difference by City',
-                        color='Price_Difference', color_continuous_scale='Bluered')
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(bar_price_difference_by_city(agg_rows(city_agg, ['City', 'Price_Difference'])),
+                            use_container_width=True)
     
-    fig = px.scatter_geo(filtered_df.groupby('City').agg({'Orders': 'sum', 'Revenue': 'sum'}).reset_index(),
-                        locations='City', locationmode='country names',
-                        color='Revenue', size='Orders',
-                        hover_name='City', hover_data=['Revenue', 'Orders'],
-                        title='Geographic Sales Distribution',
-                        scope='asia', center={'lat': 20, 'lon': 78},
-                        projection='natural earth')
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(geo_sales_by_city(agg_rows(city_agg, ['City', 'Orders', 'Revenue'])),
+                    use_container_width=True)
 
 with tab4:
     st.markdown('<p class="subheader">Strategic Recommendations for Tata 1mg</p>', unsafe_allow_html=True)
-    
-    st.markdown("""
-    <div class="highlight">
-    <h4>📈 Pricing Strategy Recommendations:</h4>
-    <ul>
-        <li><strong>Selective Price Increases:</strong> For medicines with high demand and low price sensitivity, consider gradual price increases.</li>
-        <li><strong>Competitive Pricing:</strong> Maintain competitive pricing for high-volume medicines to drive customer acquisition.</li>
-        <li><strong>Dynamic Pricing:</strong> Implement dynamic pricing based on regional competition and demand patterns.</li>
-    </ul>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("""
-    <div class="highlight">
-    <h4>🏙️ Regional Strategy Recommendations:</h4>
-    <ul>
-        <li><strong>Focus on High-Growth Cities:</strong> Allocate more marketing resources to cities showing strong growth potential.</li>
-        <li><strong>Localized Promotions:</strong> Create city-specific promotions based on prevalent diseases in each region.</li>
-        <li><strong>Inventory Optimization:</strong> Adjust inventory levels based on regional disease patterns and seasonal trends.</li>
-    </ul>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("""
-    <div class="highlight">
-    <h4>📊 Data-Driven Opportunities:</h4>
-    <ul>
-        <li><strong>Predictive Analytics:</strong> Use historical sales data to forecast demand and optimize inventory.</li>
-        <li><strong>Customer Segmentation:</strong> Analyze purchase patterns to create targeted marketing campaigns.</li>
-        <li><strong>Price Monitoring:</strong> Establish automated price tracking to respond quickly to market changes.</li>
-    </ul>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(RECOMMENDATIONS_HTML, unsafe_allow_html=True)
 
 # Footer
 st.markdown("---")